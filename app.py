@@ -1,9 +1,17 @@
 import streamlit as st
 from datetime import datetime, timedelta
+from collections import defaultdict
+from operator import itemgetter
 import os
-from supabase import create_client, Client
+import time
+import base64
+import hashlib
+from supabase import create_client, Client, ClientOptions
+from cryptography.fernet import Fernet, InvalidToken
 import requests
 import json
+import html
+from concurrent.futures import ThreadPoolExecutor
 
 # Konfiguration
 st.set_page_config(
@@ -14,8 +22,12 @@ st.set_page_config(
 )
 
 # Supabase Verbindung
-@st.cache_resource
 def init_supabase():
+    """Eigener Client pro Browser-Sitzung: Login und Token-Refresh schalten nur dessen Anmeldung um,
+    und alle Abfragen der Sitzung laufen mit ihrem eigenen Access Token"""
+    if '_supabase' in st.session_state:
+        return st.session_state._supabase
+    
     try:
         # Erst Streamlit Secrets versuchen (für Cloud Deployment)
         url = st.secrets.get("SUPABASE_URL") or st.secrets.get("supabase", {}).get("url")
@@ -44,7 +56,11 @@ def init_supabase():
         """)
         st.stop()
     
-    return create_client(url, key)
+    # Die httpx-Session (Keep-Alive) des Clients wird über alle Reruns der Sitzung wiederverwendet.
+    # Das Access Token erneuert restore_session() im Script-Lauf, damit das Cookie das neue Refresh-Token erhält.
+    options = ClientOptions(postgrest_client_timeout=10, storage_client_timeout=10, auto_refresh_token=False)
+    st.session_state._supabase = create_client(url, key, options=options)
+    return st.session_state._supabase
 
 supabase: Client = init_supabase()
 
@@ -67,13 +83,40 @@ def get_n8n_config():
 
 N8N_CONFIG = get_n8n_config()
 
+# Login-Cookie (optional - nur wenn COOKIE_KEY gesetzt ist)
+COOKIE_NAME = "fd_refresh_token"
+COOKIE_MAX_AGE = 30 * 24 * 3600
+
+# Setzt bzw. löscht das Cookie im Browser (das Komponenten-iframe hat dieselbe Origin wie die App)
+COOKIE_SCRIPT_TEMPLATE = """<script>
+const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+window.parent.document.cookie = "{name}={value}; Max-Age={max_age}; Path=/; SameSite=Strict" + secure;
+</script>"""
+
+def init_cookies():
+    """Schlüssel für das verschlüsselte Login-Cookie, damit ein Login einen Browser-Refresh übersteht"""
+    try:
+        password = st.secrets.get("COOKIE_KEY") or os.environ.get("COOKIE_KEY")
+    except (FileNotFoundError, KeyError):
+        password = os.environ.get("COOKIE_KEY")
+    
+    if not password:
+        return None
+    
+    return Fernet(base64.urlsafe_b64encode(hashlib.sha256(password.encode()).digest()))
+
+cookies = init_cookies()
+
 # Session State initialisieren
-if 'authenticated' not in st.session_state:
-    st.session_state.authenticated = False
-if 'user' not in st.session_state:
-    st.session_state.user = None
-if 'family_id' not in st.session_state:
-    st.session_state.family_id = None
+for key, default in (
+    ('authenticated', False),
+    ('user', None),
+    ('family_id', None),
+    ('user_role', 'Member'),
+    ('display_name', None),
+    ('week_offset', 0)
+):
+    st.session_state.setdefault(key, default)
 
 # Farben für Kategorien
 COLORS = {
@@ -84,40 +127,692 @@ COLORS = {
     "Gesundheit": "#98D8C8"
 }
 
-# n8n Webhook Helper
-def call_n8n_webhook(endpoint: str, method: str = "POST", data: dict = None, params: dict = None):
-    """Hilfsfunktion für n8n Webhook-Aufrufe"""
-    if not N8N_CONFIG["enabled"]:
+# Ferien-Typen mit Farbe und Icon
+VACATION_TYPES = ("Schulferien", "Urlaub", "Feiertag", "Brückentag", "Homeoffice")
+
+TYPE_COLORS = {
+    "Schulferien": "#FF6B6B",
+    "Urlaub": "#4ECDC4",
+    "Feiertag": "#45B7D1",
+    "Brückentag": "#FFA07A",
+    "Homeoffice": "#98D8C8"
+}
+
+TYPE_ICONS = {
+    "Schulferien": "🎒",
+    "Urlaub": "✈️",
+    "Feiertag": "🎉",
+    "Brückentag": "🌉",
+    "Homeoffice": "💻"
+}
+
+# Wochentage für den Wochenplan
+WEEKDAYS_SHORT = ("Mo", "Di", "Mi", "Do", "Fr", "Sa", "So")
+
+# Wochenkalender: Stundenraster 06:00–22:00 als (Stunde, Zeitspalten-HTML), einmalig beim Import erstellt
+TIME_SLOTS = tuple((f"{h:02d}", f'<div class="time-label">{h:02d}:00</div>') for h in range(6, 23))
+CALENDAR_TIME_HEADER = '<div class="calendar-header time-header">⏰<br><span style="font-size: 0.8em;">Zeit</span></div>'
+
+# Sortierschlüssel
+_start_time_key = itemgetter('start_time')
+_created_at_key = itemgetter('created_at')
+
+def _html_text(value, default=''):
+    """Benutzertext für die HTML-Vorlagen: escapen und Zeilenumbrüche als <br>, damit weder Markup
+    noch eine Leerzeile (beendet den Markdown-HTML-Block) die gemeinsame Ausgabe zerlegt"""
+    text = html.escape(str(value)) if value not in (None, '') else default
+    return text.replace('\r\n', '\n').replace('\n', '<br>')
+
+# HTML-Vorlagen für Karten (einmalig beim Import erstellt, im Render-Loop per str.format befüllt)
+KANBAN_CARD_TEMPLATE = """
+<div class="fd-task fd-cat-{category}">
+    <h4 style="margin: 0;">{title}</h4>
+    <p style="margin: 5px 0; font-size: 0.9em;">{description}</p>
+    <small>📌 {category} | 👤 {assigned_to} | 📅 {due_date}</small><br>
+    <small>⚡ Priorität: {priority}</small>
+</div>
+"""
+
+# Kategorie-Farben als CSS-Klassen (einmal pro Seite statt Inline-Styles in jeder Karte)
+KANBAN_CSS = (
+    "<style>"
+    ".fd-task{background-color:#CCCCCC20;padding:15px;border-radius:10px;"
+    "border-left:5px solid #CCCCCC;margin-bottom:10px;}"
+    + "".join(
+        f".fd-cat-{category}{{background-color:{color}20;border-left-color:{color};}}"
+        for category, color in COLORS.items()
+    )
+    + "</style>"
+)
+
+# Farbregeln je Ferien-Typ (Standardfarbe #667eea steht in VACATION_CARD_CSS)
+VACATION_TYPE_CSS_TEMPLATE = (
+    ".fd-vac-t-{name} .fd-vac-icon{{background:linear-gradient(145deg,{color}85,{color}60);"
+    "box-shadow:0 8px 24px {color}40,inset 0 2px 4px rgba(255,255,255,0.3);}}"
+    ".fd-vac-t-{name} .fd-vac-type{{background:linear-gradient(145deg,{color}65,{color}40);"
+    "box-shadow:0 4px 16px {color}30;}}"
+    ".fd-vac-t-{name} .fd-vac-title{{background-image:linear-gradient(135deg,{color},{color}DD);}}"
+    ".fd-vac-t-{name} .fd-vac-notes{{border-left-color:{color};}}"
+)
+
+VACATION_TYPE_CSS = "<style>" + "".join(
+    VACATION_TYPE_CSS_TEMPLATE.format(name=vac_type, color=color)
+    for vac_type, color in TYPE_COLORS.items()
+) + "</style>"
+
+# Stylesheet der Ferien-Karten (einmal pro Seite statt pro Karte in einem eigenen iframe)
+VACATION_CARD_CSS = """
+<link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap" rel="stylesheet">
+<style>
+.fd-vac-grid {
+    display: grid;
+    grid-template-columns: repeat(auto-fill, minmax(320px, 1fr));
+    column-gap: 20px;
+}
+.fd-vac-card, .fd-vac-card * {
+    font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
+    box-sizing: border-box;
+}
+.fd-vac-card {
+    background: linear-gradient(145deg, rgba(255, 255, 255, 0.98), rgba(248, 250, 252, 0.98));
+    backdrop-filter: blur(20px);
+    border-radius: 22px;
+    padding: 24px;
+    margin-bottom: 20px;
+    box-shadow: 0 12px 40px rgba(102, 126, 234, 0.12),
+                inset 0 1px 0 rgba(255, 255, 255, 0.8);
+    border: 1.5px solid rgba(102, 126, 234, 0.15);
+    transition: all 0.4s ease;
+    position: relative;
+    overflow: hidden;
+}
+.fd-vac-card:hover {
+    transform: translateY(-5px);
+    box-shadow: 0 20px 60px rgba(102, 126, 234, 0.2);
+}
+.fd-vac-overlay {
+    position: absolute;
+    top: 0;
+    left: 0;
+    right: 0;
+    height: 50%;
+    background: linear-gradient(180deg, rgba(255,255,255,0.4), transparent);
+    pointer-events: none;
+}
+.fd-vac-head { display: flex; align-items: center; gap: 14px; margin-bottom: 16px; }
+.fd-vac-icon {
+    width: 60px; height: 60px;
+    border-radius: 16px;
+    display: flex; align-items: center; justify-content: center;
+    font-size: 2em;
+    background: linear-gradient(145deg, #667eea85, #667eea60);
+    box-shadow: 0 8px 24px #667eea40, inset 0 2px 4px rgba(255,255,255,0.3);
+}
+.fd-vac-type {
+    background: linear-gradient(145deg, #667eea65, #667eea40);
+    box-shadow: 0 4px 16px #667eea30;
+    padding: 8px 18px;
+    border-radius: 12px;
+    display: inline-block;
+    color: white;
+    font-weight: 700;
+    font-size: 0.9em;
+    margin-bottom: 6px;
+}
+.fd-vac-duration { color: #888; font-size: 0.85em; font-weight: 600; }
+.fd-vac-title {
+    margin: 16px 0 14px 0;
+    font-size: 1.5em;
+    font-weight: 800;
+    background-image: linear-gradient(135deg, #667eea, #667eeaDD);
+    -webkit-background-clip: text;
+    -webkit-text-fill-color: transparent;
+    line-height: 1.3;
+}
+.fd-vac-dates {
+    background: linear-gradient(145deg, rgba(102, 126, 234, 0.12), rgba(118, 75, 162, 0.08));
+    padding: 14px 20px;
+    border-radius: 14px;
+    margin: 16px 0;
+    box-shadow: 0 4px 12px rgba(102, 126, 234, 0.08);
+    display: flex;
+    align-items: center;
+    gap: 12px;
+    flex-wrap: wrap;
+    font-weight: 700;
+    font-size: 1.1em;
+}
+.fd-vac-person {
+    display: inline-block;
+    background: linear-gradient(145deg, rgba(102, 126, 234, 0.18), rgba(102, 126, 234, 0.12));
+    padding: 10px 18px;
+    border-radius: 12px;
+    font-size: 0.95em;
+    font-weight: 700;
+    color: #667eea;
+    box-shadow: 0 2px 8px rgba(102, 126, 234, 0.15);
+}
+.fd-vac-notes {
+    background: rgba(248, 250, 252, 0.8);
+    padding: 14px 18px;
+    border-radius: 12px;
+    margin-top: 16px;
+    border-left: 3px solid #667eea;
+    color: #4a5568;
+    line-height: 1.7;
+    font-size: 0.95em;
+}
+</style>
+"""
+
+# Monatsüberschrift der Ferien-Zeitleiste
+VACATION_MONTH_TEMPLATE = """
+<div style="background: linear-gradient(145deg, rgba(102, 126, 234, 0.12), rgba(118, 75, 162, 0.12));
+            backdrop-filter: blur(20px);
+            padding: 16px 24px;
+            border-radius: 18px;
+            margin-bottom: 20px;
+            box-shadow: 0 8px 24px rgba(102, 126, 234, 0.15),
+                        inset 0 1px 0 rgba(255, 255, 255, 0.8);
+            border-left: 5px solid #667eea;">
+    <h3 style="margin: 0; color: #667eea; font-weight: 800; font-size: 1.3em;">📆 {month}</h3>
+</div>
+"""
+
+VACATION_NOTES_TEMPLATE = '''<div class="fd-vac-notes">💬 {notes}</div>'''
+
+# Ferien-Karte (ohne Leerzeilen, damit Markdown den HTML-Block nicht unterbricht)
+VACATION_CARD_TEMPLATE = """<div class="fd-vac-card fd-vac-t-{type}">
+    <div class="fd-vac-overlay"></div>
+    <div class="fd-vac-head">
+        <div class="fd-vac-icon">{icon}</div>
+        <div>
+            <div class="fd-vac-type">{type}</div>
+            <div class="fd-vac-duration">⏱️ {duration} Tag{plural}</div>
+        </div>
+    </div>
+    <h3 class="fd-vac-title">{title}</h3>
+    <div class="fd-vac-dates">
+        <span style="color: #667eea;">📅 {start}</span>
+        <span style="color: #999; font-weight: 600;">→</span>
+        <span style="color: #764ba2;">📅 {end}</span>
+    </div>
+    <span class="fd-vac-person">👤 {person}</span>{notes_html}
+</div>"""
+
+# HTML-Vorlage für einen Termin im Wochenplan (einmalig beim Import erstellt,
+# Platzhalter = Felder der normalisierten Zeilen aus _load_schedule_events, daher format_map(event))
+EVENT_BLOCK_TEMPLATE = '''
+                <div class="event-block" 
+                      style="background: linear-gradient(145deg, {color}30, {color}15); 
+                            border-left: 5px solid {color};
+                            box-shadow: 0 8px 24px {color}30, inset 0 1px 0 rgba(255,255,255,0.2);" 
+                      title="{desc_safe}">
+                    <div class="event-time">{start}-{end}</div>
+                    <div class="event-title">{title_safe}</div>
+                    <div class="event-person">👤 {person_safe}</div>
+                </div>
+                '''
+
+# Statisches CSS des Wochenplans (außerhalb des Fragments, pro Seitenlauf nur einmal gesendet)
+WEEKLY_CSS = """
+    <style>
+        /* CSS-Stile für die optische Gestaltung (Glossy-Look, Box-Schatten, Hintergrund-Fixes) */
+        .stApp {
+            background-color: transparent !important;
+        }
+
+        /* HARD FIX: Verstecke alle unsichtbaren Streamlit-Blöcke (verhindert helle Boxen) */
+        div[data-testid^="stHorizontalBlock"],
+        div[data-testid^="stVerticalBlock"],
+        div[data-testid="stBlock"] {
+            background-color: transparent !important;
+            box-shadow: none !important;
+            border: none !important;
+            padding: 0 !important;
+            margin: 0 !important;
+        }
+        
+        div[data-testid^="stVerticalBlock"] > div:empty,
+        div[data-testid^="stHorizontalBlock"] > div:empty,
+        div[data-testid="stBlock"] > div:empty {
+            background-color: transparent !important;
+            box-shadow: none !important;
+            border: none !important;
+        }
+
+        /* KORREKTUR: st.divider() Linien */
+        .stDivider {
+            background: transparent !important;
+            box-shadow: none !important;
+            border: none !important;
+            padding: 0 !important;
+            margin: 20px 0 !important;
+        }
+        .stDivider > div {
+            border-top: 2px solid rgba(255, 255, 255, 0.15) !important;
+            height: 0 !important;
+        }
+        
+        /* Gezielte Glossy-Anpassung der sichtbaren Streamlit-Widgets */
+        .stExpander, 
+        .stMultiSelect, 
+        .stSelectbox, 
+        .stTextInput, 
+        .stTextArea, 
+        .stDateInput, 
+        .stTimeInput,
+        div[data-testid="stForm"],
+        div[data-testid="stHorizontalBlock"] > div:nth-child(2)
+        {
+            background: rgba(255, 255, 255, 0.08) !important;
+            backdrop-filter: blur(15px) saturate(180%);
+            -webkit-backdrop-filter: blur(15px) saturate(180%);
+            border-radius: 18px !important;
+            border: 1px solid rgba(255, 255, 255, 0.2) !important;
+            box-shadow: 0 4px 20px rgba(0, 0, 0, 0.2), inset 0 1px 0 rgba(255, 255, 255, 0.3);
+            padding: 15px;
+            color: #f3f4f6;
+        }
+        
+        .create-card {
+            background: linear-gradient(135deg, rgba(102, 126, 234, 0.15), rgba(118, 75, 162, 0.15)) !important;
+            border: 2px solid rgba(102, 126, 234, 0.4) !important;
+            border-radius: 28px !important;
+            box-shadow: 0 15px 45px rgba(102, 126, 234, 0.3), inset 0 2px 0 rgba(255, 255, 255, 0.4);
+            padding: 0; 
+        }
+        .create-card .stExpander {
+             box-shadow: none !important;
+             border: none !important;
+        }
+
+        .delete-button-box {
+            background: rgba(255, 59, 48, 0.15) !important;
+            backdrop-filter: blur(10px);
+            border: 2px solid rgba(255, 59, 48, 0.3) !important;
+            border-radius: 16px !important;
+            padding: 8px !important;
+            box-shadow: 0 8px 24px rgba(255, 59, 48, 0.25), inset 0 1px 0 rgba(255, 255, 255, 0.2);
+            transition: all 0.3s ease;
+        }
+        .delete-button-box:hover {
+            background: rgba(255, 59, 48, 0.25) !important;
+            border-color: rgba(255, 59, 48, 0.5) !important;
+            box-shadow: 0 12px 32px rgba(255, 59, 48, 0.4);
+            transform: translateY(-2px);
+        }
+        
+    </style>
+    """
+
+# n8n Webhook Helper (bei deaktiviertem n8n wird beim Import eine No-op-Variante definiert)
+if N8N_CONFIG["enabled"]:
+    def call_n8n_webhook(endpoint: str, method: str = "POST", data: dict = None, params: dict = None):
+        """Hilfsfunktion für n8n Webhook-Aufrufe"""
+        try:
+            if method == "GET":
+                response = requests.get(endpoint, params=params, timeout=10)
+            else:
+                response = requests.post(endpoint, json=data, timeout=10)
+            
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            st.warning(f"n8n nicht erreichbar: {str(e)}")
+            return None
+else:
+    def call_n8n_webhook(endpoint: str, method: str = "POST", data: dict = None, params: dict = None):
+        """n8n ist nicht konfiguriert: kein Aufruf"""
         return None
+
+# Spaltenlisten der Lesezugriffe (nur was die Seiten tatsächlich anzeigen).
+# assigned_to/person speichern bewusst den Anzeigenamen, damit kein Join auf family_members nötig ist.
+TASK_COLUMNS = 'id,title,description,category,priority,assigned_to,due_date,status,created_at'
+SHOPPING_LIST_COLUMNS = 'id,name,shopping_items(id,list_id,name,category,quantity,is_checked)'
+VACATION_COLUMNS = 'id,person,type,title,start_date,end_date,notes'
+EVENT_COLUMNS = 'id,title,person,category,event_date,start_time,end_time,description'
+
+# Kanban-Spalten und Aufgaben pro Spalte und Seite
+TASK_STATUSES = ("To-Do", "In Progress", "Done")
+TASK_PAGE_SIZE = 50
+
+# Pseudo-Status im Kanban-Formular für Löschen
+DELETE_ACTION = "🗑️ Löschen"
+
+def _family_query(table, columns, family_id):
+    """Baut die gemeinsame Abfrage 'Spalten einer Tabelle für eine Familie' auf"""
+    return supabase.table(table).select(columns).eq('family_id', family_id)
+
+@st.cache_resource
+def _read_pool():
+    """Thread-Pool pro Server-Prozess für parallele, voneinander unabhängige Lesezugriffe"""
+    return ThreadPoolExecutor(max_workers=6)
+
+def _query_task_page(family_id, status, before, limit):
+    """Lädt eine Seite Aufgaben einer Kanban-Spalte, neueste zuerst (Keyset-Paginierung über
+    (created_at, id): gleiche Zeitstempel an einer Seitengrenze gehen weder verloren noch doppelt).
+
+    before ist der Cursor (created_at, id) der letzten Aufgabe der vorigen Seite.
+    Gibt (tasks, next_cursor) zurück; next_cursor ist None, wenn es keine älteren Aufgaben gibt.
+    Passender Index: tasks (family_id, status, created_at desc, id desc) aus
+    supabase/migrations/*_dashboard_indexes.sql – Index-Reihenfolge, kein Sortierschritt.
+    """
+    query = _family_query('tasks', TASK_COLUMNS, family_id).eq('status', status)
+    if before:
+        created_at, task_id = before
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{task_id}")')
+    rows = query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1).execute().data
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        return rows[:limit], (last['created_at'], last['id'])
+    return rows, None
+
+# Gecachte Lesezugriffe (Streamlit führt bei jeder Interaktion das ganze Skript aus)
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_task_board(family_id, cursors, limit=TASK_PAGE_SIZE):
+    """Lädt je Kanban-Spalte eine eigene Seite, damit alte erledigte Aufgaben offene nicht verdrängen.
+
+    cursors ist ein Tupel (status, cursor) je Spalte; die Spalten werden parallel abgefragt.
+    Gibt {status: (tasks, next_cursor)} zurück.
+    """
+    futures = {
+        status: _read_pool().submit(_query_task_page, family_id, status, before, limit)
+        for status, before in cursors
+    }
+    return {status: future.result() for status, future in futures.items()}
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_shopping_lists(family_id):
+    """Lädt alle Einkaufslisten einer Familie inkl. Artikel (eine Abfrage per PostgREST-Embedding).
+
+    Passende Indizes: shopping_lists (family_id), shopping_items (list_id) für das Embedding,
+    siehe supabase/migrations/*_dashboard_indexes.sql.
+    """
+    return _family_query('shopping_lists', SHOPPING_LIST_COLUMNS, family_id).execute().data
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_vacations(family_id, window_start, window_end, persons=(), types=()):
+    """Lädt die Ferienzeiten einer Familie, die das Zeitfenster berühren, nach Startdatum sortiert.
+
+    Person- und Typfilter werden direkt in der Abfrage angewendet (leer = kein Filter).
+    Ohne Zeitfenster (window_start/window_end = None) werden alle Einträge geladen (Archiv).
+    Passender Index: vacations (family_id, start_date), siehe supabase/migrations/*_dashboard_indexes.sql.
+    """
+    query = _family_query('vacations', VACATION_COLUMNS, family_id)
+    if window_start:
+        query = query.gte('end_date', window_start.isoformat())
+    if window_end:
+        query = query.lte('start_date', window_end.isoformat())
+    if persons:
+        query = query.in_('person', list(persons))
+    if types:
+        query = query.in_('type', list(types))
+    return query.order('start_date', desc=False).execute().data
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_vacation_persons(family_id):
+    """Lädt die (sortierten, eindeutigen) Personen mit Ferieneinträgen einer Familie"""
+    rows = _family_query('vacations', 'person', family_id).not_.is_('person', 'null').execute().data
+    return sorted({r['person'] for r in rows if r['person']})
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_schedule_events(family_id, week_start, week_end):
+    """Lädt die Termine einer Familie im Zeitraum week_start bis week_end.
+
+    Filter und Sortierung passen zum Index schedule_events (family_id, event_date, start_time)
+    aus supabase/migrations/*_dashboard_indexes.sql – Index-Scan ohne Sortierschritt.
+    """
+    response = _family_query('schedule_events', EVENT_COLUMNS, family_id)\
+        .gte('event_date', week_start.isoformat())\
+        .lte('event_date', week_end.isoformat())\
+        .order('event_date')\
+        .order('start_time')\
+        .execute()
+    # Zeiten und HTML-Escaping einmalig beim Laden normalisieren, statt bei jedem Rerun
+    return [
+        {
+            **e,
+            'start': (e.get('start_time') or '')[:5],
+            'end': (e.get('end_time') or '')[:5],
+            'hour': (e.get('start_time') or '')[:2],
+            'color': COLORS.get(e.get('category'), '#CCCCCC'),
+            'title_safe': html.escape(e.get('title') or 'N/A'),
+            'person_safe': html.escape(e.get('person') or 'N/A'),
+            'desc_safe': html.escape(e.get('description') or ''),
+        }
+        for e in response.data or []
+    ]
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_membership(user_id):
+    """Lädt Familie, Rolle und Anzeigename eines Users (oder None)"""
+    rows = supabase.table('family_members').select('family_id,role,display_name').eq('user_id', user_id).limit(1).execute().data
+    return rows[0] if rows else None
+
+# Zuordnung Tabelle -> gecachte Loader (für die Invalidierung nach Änderungen)
+_LOADERS_BY_TABLE = {
+    'tasks': (_load_task_board,),
+    'shopping_lists': (_load_shopping_lists,),
+    'shopping_items': (_load_shopping_lists,),
+    'vacations': (_load_vacations, _load_vacation_persons),
+    'schedule_events': (_load_schedule_events,),
+    'family_members': (_load_membership,),
+}
+
+def _session_cached(table, loader, *args, ttl=30):
+    """Zweite Cache-Stufe pro Sitzung: Filter-Reruns lesen direkt aus st.session_state"""
+    cache = st.session_state.setdefault('_data_cache', {})
+    key = (table, *args)
+    entry = cache.get(key)
+    if entry is None or time.time() - entry['ts'] > ttl:
+        entry = {'rows': loader(*args), 'ts': time.time()}
+        cache[key] = entry
+    return entry['rows']
+
+def _prune_session_cache(max_age=600):
+    """Entfernt veraltete Einträge aus dem Sitzungs-Cache, damit er nicht unbegrenzt wächst"""
+    cache = st.session_state.get('_data_cache')
+    if not cache:
+        return
+    now = time.time()
+    for key in [k for k, entry in cache.items() if now - entry['ts'] > max_age]:
+        del cache[key]
+
+def _invalidate(table):
+    """Verwirft alle gecachten Daten einer Tabelle (nach jedem Insert/Update/Delete aufrufen)"""
+    for loader in _LOADERS_BY_TABLE.get(table, ()):
+        loader.clear()
+    cache = st.session_state.get('_data_cache', {})
+    for key in [k for k in cache if k[0] == table]:
+        del cache[key]
+
+def _write_queue():
+    """Schreib-Warteschlange dieser Browser-Sitzung: ein einzelner Worker, damit Änderungen
+    in Klick-Reihenfolge beim Server ankommen"""
+    if '_write_queue' not in st.session_state:
+        st.session_state._write_queue = ThreadPoolExecutor(max_workers=1)
+    return st.session_state._write_queue
+
+def _write_in_background(table, query, rollback=None):
+    """Führt eine Mutation im Hintergrund aus (optimistische UI). Danach wird der gemeinsame Cache
+    der Tabelle geleert und ihre Sitzungs-Einträge gelten als veraltet; schlägt sie fehl, werden die
+    Einträge aus rollback (Stand vor der optimistischen Änderung) wiederhergestellt.
+    Fehler werden beim nächsten Lauf von _report_write_errors gezeigt."""
+    errors = st.session_state.setdefault('_write_errors', [])
+    cache = st.session_state.setdefault('_data_cache', {})
+    def run():
+        try:
+            query.execute()
+        except Exception as e:
+            # Nur noch vorhandene Schlüssel ersetzen: das Dict wird parallel im Script-Thread gelesen
+            for key, entry in (rollback or {}).items():
+                if key in cache:
+                    cache[key] = entry
+            errors.append((table, str(e)))
+        else:
+            # ts = 0: der nächste Lauf lädt die Tabelle vom Server statt der optimistischen Zeilen
+            for key, entry in list(cache.items()):
+                if key[0] == table:
+                    entry['ts'] = 0
+        finally:
+            for loader in _LOADERS_BY_TABLE.get(table, ()):
+                loader.clear()
+    return _write_queue().submit(run)
+
+def _drop_cached_rows(table, ids):
+    """Entfernt Zeilen sofort aus dem Sitzungs-Cache, ohne auf den Server zu warten.
+    Gibt die vorherigen Einträge zurück (rollback für _write_in_background)."""
+    ids = set(ids)
+    previous = {}
+    for key, entry in st.session_state.get('_data_cache', {}).items():
+        if key[0] == table:
+            previous[key] = dict(entry)
+            entry['rows'] = [r for r in entry['rows'] if r.get('id') not in ids]
+            # Frischer Zeitstempel: die TTL darf die optimistischen Zeilen nicht durch den alten Loader-Stand ersetzen
+            entry['ts'] = time.time()
+    return previous
+
+def _move_cached_tasks(ids, status=None):
+    """Optimistisch im Sitzungs-Cache: Aufgaben entfernen bzw. (status gesetzt) in die erste
+    Seite der Zielspalte verschieben. Gibt die vorherigen Einträge zurück (rollback)."""
+    ids = set(ids)
+    previous = {}
+    for key, entry in st.session_state.get('_data_cache', {}).items():
+        if key[0] != 'tasks':
+            continue
+        previous[key] = dict(entry)
+        board_cursors = dict(key[2])
+        moved = [{**t, 'status': status} for tasks, _ in entry['rows'].values() for t in tasks if t['id'] in ids]
+        board = {}
+        for page_status, (tasks, next_cursor) in entry['rows'].items():
+            tasks = [t for t in tasks if t['id'] not in ids]
+            if status and page_status == status and board_cursors.get(page_status) is None:
+                tasks = sorted(tasks + moved, key=_created_at_key, reverse=True)
+            board[page_status] = (tasks, next_cursor)
+        entry['rows'] = board
+        entry['ts'] = time.time()
+    return previous
+
+def _clear_cached_status(status):
+    """Optimistisch im Sitzungs-Cache: leert die Spalte status auf allen Boards, auch unter dem
+    Schlüssel mit zurückgesetztem Cursor dieser Spalte. Gibt die vorherigen Einträge zurück (rollback)."""
+    cache = st.session_state.get('_data_cache', {})
+    previous = {}
+    for key, entry in [(k, e) for k, e in cache.items() if k[0] == 'tasks']:
+        first_page_key = (*key[:2], tuple((s, None if s == status else c) for s, c in key[2]))
+        cleared = {'rows': {**entry['rows'], status: ([], None)}, 'ts': time.time()}
+        for k in (key, first_page_key):
+            # Ohne vorherigen Eintrag: nach einem Fehler mit ts = 0 neu laden lassen
+            previous.setdefault(k, dict(cache[k]) if k in cache else {**cleared, 'ts': 0})
+            cache[k] = dict(cleared)
+    return previous
+
+def _report_write_errors():
+    """Zeigt fehlgeschlagene Hintergrund-Schreibzugriffe (ihr Cache ist bereits zurückgesetzt)"""
+    errors = st.session_state.get('_write_errors')
+    while errors:
+        table, message = errors.pop(0)
+        st.error(f"❌ Änderung an '{table}' fehlgeschlagen: {message}")
+
+# Authentifizierungs-Funktionen
+def _cookie_refresh_token():
+    """Entschlüsselt das Refresh-Token aus dem Login-Cookie (None, wenn keins oder ungültig)"""
+    value = st.context.cookies.get(COOKIE_NAME)
+    if not value:
+        return None
+    try:
+        return cookies.decrypt(value.encode(), ttl=COOKIE_MAX_AGE).decode()
+    except InvalidToken:
+        return None
+
+def _remember_refresh_token(refresh_token):
+    """Merkt ein neues Refresh-Token für das Cookie vor (None löscht es); main() schreibt es"""
+    if cookies is not None and refresh_token != st.session_state.get('_cookie_token', ''):
+        st.session_state._cookie_token = refresh_token
+        st.session_state._cookie_pending = True
+
+def write_cookie():
+    """Schreibt ein vorgemerktes Login-Cookie über eine unsichtbare Komponente in den Browser"""
+    if not st.session_state.pop('_cookie_pending', False):
+        return
     
+    refresh_token = st.session_state._cookie_token
+    if refresh_token:
+        value, max_age = cookies.encrypt(refresh_token.encode()).decode(), COOKIE_MAX_AGE
+    else:
+        value, max_age = "", 0
+    st.components.v1.html(COOKIE_SCRIPT_TEMPLATE.format(name=COOKIE_NAME, value=value, max_age=max_age), height=0)
+
+def _membership_from_token(session):
+    """Liest family_id, role und display_name aus den JWT-Claims (app_metadata), falls ein
+    Custom Access Token Hook sie setzt; sonst None (dann wird family_members abgefragt)"""
     try:
-        if method == "GET":
-            response = requests.get(endpoint, params=params, timeout=10)
-        else:
-            response = requests.post(endpoint, json=data, timeout=10)
-        
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.warning(f"n8n nicht erreichbar: {str(e)}")
+        payload = session.access_token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except (AttributeError, IndexError, ValueError):
+        return None
+    
+    app_metadata = claims.get('app_metadata') or {}
+    if not app_metadata.get('family_id'):
         return None
+    return {
+        'family_id': app_metadata['family_id'],
+        'role': app_metadata.get('role', 'Member'),
+        'display_name': app_metadata.get('display_name')
+    }
+
+def _start_session(response):
+    """Übernimmt eine Supabase Auth-Antwort in den Session State und merkt sich das Refresh-Token"""
+    st.session_state.user = response.user
+    st.session_state.authenticated = True
+    
+    # Family ID laden (aus dem Token, sonst per Abfrage)
+    membership = _membership_from_token(response.session) or _load_membership(response.user.id)
+    if membership:
+        st.session_state.family_id = membership['family_id']
+        st.session_state.user_role = membership['role']
+        st.session_state.display_name = membership['display_name']
+    
+    if response.session:
+        _remember_refresh_token(response.session.refresh_token)
+
+def restore_session():
+    """Erneuert ein ablaufendes Access Token, bevor der Lauf Abfragen stellt, bzw. meldet den User
+    über das Login-Cookie wieder an (z.B. nach einem Browser-Refresh)"""
+    if st.session_state.authenticated:
+        try:
+            session = supabase.auth.get_session()
+        except Exception:
+            # z.B. Netzwerkfehler: der nächste Lauf versucht es erneut
+            return
+        if session:
+            _remember_refresh_token(session.refresh_token)
+        return
+    
+    # Das Cookie stammt aus der Anfrage, die die Sitzung geöffnet hat, und ändert sich bis zum
+    # nächsten Browser-Refresh nicht: nur einmal versuchen (nach einem Logout nicht erneut)
+    if cookies is None or st.session_state.get('_cookie_checked'):
+        return
+    st.session_state._cookie_checked = True
+    
+    refresh_token = _cookie_refresh_token()
+    if not refresh_token:
+        return
+    
+    try:
+        _start_session(supabase.auth.refresh_session(refresh_token))
+    except Exception:
+        # Abgelaufenes oder ungültiges Token: normal über die Login-Seite anmelden
+        _remember_refresh_token(None)
 
-# Authentifizierungs-Funktionen
 def login_user(email, password):
     try:
         response = supabase.auth.sign_in_with_password({
             "email": email,
             "password": password
         })
-        st.session_state.user = response.user
-        st.session_state.authenticated = True
-        
-        # Family ID laden
-        family_member = supabase.table('family_members').select('*').eq('user_id', response.user.id).execute()
-        if family_member.data:
-            st.session_state.family_id = family_member.data[0]['family_id']
-            st.session_state.user_role = family_member.data[0]['role']
-            st.session_state.display_name = family_member.data[0]['display_name']
+        _start_session(response)
         return True
     except Exception as e:
         st.error(f"Login fehlgeschlagen: {str(e)}")
@@ -147,6 +842,7 @@ def register_user(email, password, display_name):
                 "role": "Member",
                 "display_name": display_name
             }).execute()
+            _invalidate('family_members')
 
             st.success("✅ Registrierung erfolgreich!")
             st.info("Sie können sich jetzt anmelden.")
@@ -164,6 +860,7 @@ def logout_user():
         st.session_state.authenticated = False
         st.session_state.user = None
         st.session_state.family_id = None
+        _remember_refresh_token(None)
     except Exception as e:
         st.error(f"Logout fehlgeschlagen: {str(e)}")
 
@@ -211,6 +908,7 @@ def login_page():
 # Kanban Board mit Supabase
 def kanban_board():
     st.title("📋 Aufgabenverwaltung (Kanban)")
+    st.markdown(KANBAN_CSS, unsafe_allow_html=True)
     
     if not st.session_state.family_id:
         st.warning("⚠️ Sie sind keiner Familie zugeordnet. Bitte kontaktieren Sie Ihren Administrator.")
@@ -222,7 +920,7 @@ def kanban_board():
         with col1:
             title = st.text_input("Titel")
             category = st.selectbox("Kategorie", list(COLORS.keys()))
-            assigned_to = st.text_input("Zugewiesen an")
+            assigned_to = st.text_input("Zugewiesen an", value=st.session_state.display_name or '')
         with col2:
             description = st.text_area("Beschreibung")
             priority = st.selectbox("Priorität", ["Niedrig", "Mittel", "Hoch"])
@@ -238,63 +936,90 @@ def kanban_board():
                     "category": category,
                     "priority": priority,
                     "assigned_to": assigned_to,
-                    "due_date": str(due_date),
+                    "due_date": due_date.isoformat(),
                     "status": "To-Do"
                 }).execute()
+                _invalidate('tasks')
                 st.success("✅ Aufgabe erstellt!")
                 st.rerun()
             except Exception as e:
                 st.error(f"Fehler: {str(e)}")
     
-    # Aufgaben laden
+    _kanban_columns()
+
+@st.fragment
+def _kanban_columns():
+    """Die drei Kanban-Spalten; Formulare und Blättern rerunnen nur dieses Fragment."""
+    _report_write_errors()  # Fragment-Reruns laufen nicht durch main()
+    # Aufgaben laden: je Spalte eine Seite ab dem gespeicherten Cursor dieser Spalte
+    cursors = st.session_state.setdefault('tasks_cursors', {})
     try:
-        response = supabase.table('tasks').select('*').eq('family_id', st.session_state.family_id).order('created_at', desc=True).execute()
-        tasks = response.data
+        board_cursors = tuple((status, cursors.get(status)) for status in TASK_STATUSES)
+        pages = _session_cached('tasks', _load_task_board, st.session_state.family_id, board_cursors)
     except Exception as e:
         st.error(f"Fehler beim Laden: {str(e)}")
         return
     
     # Kanban Spalten
-    col1, col2, col3 = st.columns(3)
-    statuses = ["To-Do", "In Progress", "Done"]
-    columns = [col1, col2, col3]
-    
-    for status, col in zip(statuses, columns):
+    for status, col in zip(TASK_STATUSES, st.columns(len(TASK_STATUSES))):
         with col:
-            status_tasks = [t for t in tasks if t['status'] == status]
-            st.subheader(f"{status} ({len(status_tasks)})")
+            status_tasks, next_cursor = pages[status]
+            # "+": es gibt weitere (ältere) Aufgaben über die geladene Seite hinaus
+            st.subheader(f"{status} ({len(status_tasks)}{'+' if next_cursor else ''})")
             
-            for task in status_tasks:
-                with st.container():
-                    st.markdown(f"""
-                    <div style="background-color: {COLORS.get(task['category'], '#CCCCCC')}20; 
-                                padding: 15px; 
-                                border-radius: 10px; 
-                                border-left: 5px solid {COLORS.get(task['category'], "#CCCCCC")};
-                                margin-bottom: 10px;">
-                        <h4 style="margin: 0;">{task['title']}</h4>
-                        <p style="margin: 5px 0; font-size: 0.9em;">{task.get('description', '')}</p>
-                        <small>📌 {task['category']} | 👤 {task.get('assigned_to', 'Niemand')} | 📅 {task.get('due_date', 'N/A')}</small><br>
-                        <small>⚡ Priorität: {task['priority']}</small>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Status ändern
-                    col_a, col_b, col_c = st.columns(3)
-                    with col_a:
-                        if status != "To-Do" and st.button("◀", key=f"left_{task['id']}"):
-                            idx = statuses.index(status)
-                            supabase.table('tasks').update({"status": statuses[idx - 1]}).eq('id', task['id']).execute()
-                            st.rerun()
-                    with col_b:
-                        if st.button("🗑️", key=f"del_{task['id']}"):
-                            supabase.table('tasks').delete().eq('id', task['id']).execute()
-                            st.rerun()
-                    with col_c:
-                        if status != "Done" and st.button("▶", key=f"right_{task['id']}"):
-                            idx = statuses.index(status)
-                            supabase.table('tasks').update({"status": statuses[idx + 1]}).eq('id', task['id']).execute()
-                            st.rerun()
+            # Alle erledigten Aufgaben der Familie (nicht nur die geladene Seite) mit einem DELETE
+            # entfernen - erst nach Bestätigung im Popover, dann optimistisch im Hintergrund
+            if status == "Done" and (status_tasks or cursors.get(status)):
+                with st.popover("🧹 Erledigte löschen", use_container_width=True):
+                    st.warning("Alle erledigten Aufgaben der Familie endgültig löschen, auch ältere, hier nicht angezeigte?")
+                    if st.button("Ja, alle löschen", key="clear_done", type="primary", use_container_width=True):
+                        rollback = _clear_cached_status(status)
+                        _write_in_background('tasks', supabase.table('tasks').delete()
+                                             .eq('family_id', st.session_state.family_id).eq('status', status), rollback)
+                        cursors.pop(status, None)
+                        st.rerun(scope="fragment")
+            
+            # Alle Karten der Spalte in einem einzigen st.markdown senden
+            if status_tasks:
+                st.markdown("".join(
+                    KANBAN_CARD_TEMPLATE.format(
+                        title=_html_text(task['title']),
+                        description=_html_text(task.get('description')),
+                        category=_html_text(task['category']),
+                        assigned_to=_html_text(task.get('assigned_to'), 'Niemand'),
+                        due_date=_html_text(task.get('due_date'), 'N/A'),
+                        priority=_html_text(task['priority'])
+                    )
+                    for task in status_tasks
+                ), unsafe_allow_html=True)
+            
+            # Status ändern / Löschen: mehrere Aufgaben pro Formular, ein einziger Request
+            if status_tasks:
+                with st.form(key=f"bulk_{status}", clear_on_submit=True):
+                    titles = {t['id']: t['title'] for t in status_tasks}
+                    selected_ids = st.multiselect("Aufgaben", list(titles), format_func=titles.get, key=f"bulk_sel_{status}")
+                    action = st.selectbox("Aktion", [s for s in TASK_STATUSES if s != status] + [DELETE_ACTION], key=f"bulk_action_{status}")
+                    if st.form_submit_button("Ausführen", use_container_width=True) and selected_ids:
+                        # Optimistisch: Ansicht sofort anpassen, der Request läuft im Hintergrund
+                        if action == DELETE_ACTION:
+                            rollback = _move_cached_tasks(selected_ids)
+                            query = supabase.table('tasks').delete().in_('id', selected_ids)
+                        else:
+                            rollback = _move_cached_tasks(selected_ids, action)
+                            query = supabase.table('tasks').update({"status": action}).in_('id', selected_ids)
+                        _write_in_background('tasks', query, rollback)
+                        st.rerun(scope="fragment")
+            
+            # Blättern je Spalte (Keyset-Paginierung über created_at, id)
+            nav_col1, nav_col2 = st.columns(2)
+            with nav_col1:
+                if cursors.get(status) and st.button("⏮ Neueste", use_container_width=True, key=f"tasks_newest_{status}"):
+                    cursors.pop(status)
+                    st.rerun(scope="fragment")
+            with nav_col2:
+                if next_cursor and st.button("Ältere ▶", use_container_width=True, key=f"tasks_older_{status}"):
+                    cursors[status] = next_cursor
+                    st.rerun(scope="fragment")
 
 # Einkaufsliste mit Supabase
 def shopping_list():
@@ -306,8 +1031,7 @@ def shopping_list():
     
     # Listen laden
     try:
-        lists_response = supabase.table('shopping_lists').select('*').eq('family_id', st.session_state.family_id).execute()
-        lists = lists_response.data
+        lists = _load_shopping_lists(st.session_state.family_id)
     except Exception as e:
         st.error(f"Fehler: {str(e)}")
         return
@@ -322,6 +1046,7 @@ def shopping_list():
                     "created_by": st.session_state.user.id,
                     "name": new_list
                 }).execute()
+                _invalidate('shopping_lists')
                 st.success(f"✅ Liste '{new_list}' erstellt!")
                 st.rerun()
             except Exception as e:
@@ -332,9 +1057,9 @@ def shopping_list():
         return
     
     # Liste auswählen
-    list_names = [l['name'] for l in lists]
-    selected_list_name = st.selectbox("Liste", list_names)
-    selected_list = next(l for l in lists if l['name'] == selected_list_name)
+    lists_by_name = {l['name']: l for l in lists}
+    selected_list_name = st.selectbox("Liste", list(lists_by_name))
+    selected_list = lists_by_name[selected_list_name]
     
     # Artikel hinzufügen
     col1, col2, col3 = st.columns([3, 2, 1])
@@ -354,27 +1079,24 @@ def shopping_list():
                 "quantity": item_quantity,
                 "is_checked": False
             }).execute()
+            _invalidate('shopping_items')
             st.rerun()
         except Exception as e:
             st.error(f"Fehler: {str(e)}")
     
     st.divider()
     
-    # Artikel laden
-    try:
-        items_response = supabase.table('shopping_items').select('*').eq('list_id', selected_list['id']).execute()
-        items = items_response.data
-    except Exception as e:
-        st.error(f"Fehler: {str(e)}")
-        return
+    # Artikel kommen bereits eingebettet mit der Liste
+    items = selected_list.get('shopping_items') or []
     
     # Nach Kategorie gruppieren
-    categories = {}
+    categories = defaultdict(list)
     for item in items:
-        cat = item['category']
-        if cat not in categories:
-            categories[cat] = []
-        categories[cat].append(item)
+        categories[item['category']].append(item)
+    
+    # Geänderte Checkboxen sammeln und nach dem Rendern gemeinsam speichern.
+    # Die Änderungen liegen in der Session, damit sie bei einem Abbruch (Rerun, Fehler) nicht verloren gehen.
+    item_diffs = st.session_state.setdefault('_item_diffs', {})
     
     for category, cat_items in categories.items():
         st.subheader(f"📦 {category}")
@@ -387,20 +1109,31 @@ def shopping_list():
                     key=f"item_{item['id']}"
                 )
                 if checked != item['is_checked']:
-                    supabase.table('shopping_items').update({"is_checked": checked}).eq('id', item['id']).execute()
+                    item_diffs[item['id']] = {**item, "is_checked": checked}
             with col2:
                 if st.button("🗑️", key=f"del_item_{item['id']}"):
+                    item_diffs.pop(item['id'], None)
                     supabase.table('shopping_items').delete().eq('id', item['id']).execute()
+                    _invalidate('shopping_items')
                     st.rerun()
+    
+    # Synchron speichern: die Checkbox-Diffs werden gegen die gecachten Zeilen gebildet, die erst
+    # nach dem Speichern neu geladen werden dürfen (sonst geht ein schnelles Zurück-Klicken verloren)
+    if item_diffs:
+        try:
+            supabase.table('shopping_items').upsert(list(item_diffs.values())).execute()
+            item_diffs.clear()
+            _invalidate('shopping_items')
+        except Exception as e:
+            st.error(f"Fehler: {str(e)}")
 
  # Ferienplanung mit Premium UI
 def vacation_planning():
-    from datetime import datetime # Import an den Anfang verschoben
-    import streamlit as st
     # Angenommen, 'supabase' ist global oder im Streamlit-Kontext verfügbar
     # Angenommen, st.session_state.family_id und st.session_state.user sind gesetzt
 
     st.title("🏖️ Ferienplanung")
+    st.markdown(VACATION_CARD_CSS, unsafe_allow_html=True)
     if not st.session_state.get('family_id'):
         st.warning("⚠️ Sie sind keiner Familie zugeordnet.")
         return
@@ -409,8 +1142,8 @@ def vacation_planning():
     with st.expander("✨ Neue Ferienzeit eintragen", expanded=False):
         col1, col2 = st.columns(2)
         with col1:
-            person = st.text_input("👤 Person", key="vac_person")
-            vacation_type = st.selectbox("🏷️ Typ", ["Schulferien", "Urlaub", "Feiertag", "Brückentag", "Homeoffice"], key="vac_type")
+            person = st.text_input("👤 Person", key="vac_person", value=st.session_state.display_name or '')
+            vacation_type = st.selectbox("🏷️ Typ", VACATION_TYPES, key="vac_type")
             start_date = st.date_input("📅 Von", key="vac_start")
         with col2:
             title = st.text_input("✏️ Bezeichnung", key="vac_title")
@@ -426,10 +1159,11 @@ def vacation_planning():
                     "person": person,
                     "type": vacation_type,
                     "title": title,
-                    "start_date": str(start_date),
-                    "end_date": str(end_date),
+                    "start_date": start_date.isoformat(),
+                    "end_date": end_date.isoformat(),
                     "notes": notes
                 }).execute()
+                _invalidate('vacations')
                 st.success("✅ Ferienzeit erfolgreich eingetragen!")
                 st.rerun()
             except NameError:
@@ -439,13 +1173,9 @@ def vacation_planning():
     
     st.divider()
     
-    # Ferienzeiten laden
+    # Personen für den Filter laden
     try:
-        # Annahme: 'supabase' ist definiert
-        response = supabase.table('vacations').select('*').eq(
-            'family_id', st.session_state.family_id
-        ).order('start_date', desc=False).execute()
-        vacations = response.data
+        all_persons = _load_vacation_persons(st.session_state.family_id)
     except NameError:
         st.error("❌ Fehler: Supabase-Client nicht definiert.")
         return
@@ -453,243 +1183,105 @@ def vacation_planning():
         st.error(f"❌ Fehler beim Laden der Daten: {str(e)}")
         return
     
-    # Filter und Stats
-    col1, col2, col3 = st.columns([2, 2, 1])
-    
-    all_persons = list(set([v['person'] for v in vacations if v['person']]))
-    with col1:
-        filter_person = st.multiselect("👥 Nach Person filtern", all_persons, default=all_persons, key="vac_filter")
+    # Filter und Stats (als Formular: erst "Anwenden" löst einen Rerun aus, nicht jede Auswahl)
+    with st.form("vac_filters", clear_on_submit=False):
+        col1, col2, col3 = st.columns([2, 2, 1])
+        
+        with col1:
+            filter_person = st.multiselect("👥 Nach Person filtern", all_persons, default=all_persons, key="vac_filter")
+        
+        with col2:
+            filter_type = st.multiselect("🏷️ Nach Typ filtern", 
+                VACATION_TYPES,
+                default=VACATION_TYPES,
+                key="vac_type_filter")
+        
+        show_archive = st.checkbox("📦 Archiv anzeigen (alle Einträge)", key="vac_archive")
+        st.form_submit_button("🔍 Filter anwenden")
     
-    with col2:
-        filter_type = st.multiselect("🏷️ Nach Typ filtern", 
-            ["Schulferien", "Urlaub", "Feiertag", "Brückentag", "Homeoffice"],
-            default=["Schulferien", "Urlaub", "Feiertag", "Brückentag", "Homeoffice"],
-            key="vac_type_filter")
+    # Ferienzeiten laden (Filter und Zeitfenster: 90 Tage zurück, 365 Tage voraus; Archiv ohne Zeitfenster)
+    today = datetime.now().date()
+    if show_archive:
+        window_start = window_end = None
+    else:
+        window_start, window_end = today - timedelta(days=90), today + timedelta(days=365)
+    try:
+        vacations = _session_cached(
+            'vacations',
+            _load_vacations,
+            st.session_state.family_id,
+            window_start,
+            window_end,
+            tuple(filter_person),
+            tuple(filter_type)
+        )
+    except Exception as e:
+        st.error(f"❌ Fehler beim Laden der Daten: {str(e)}")
+        return
     
     with col3:
         st.metric("📊 Einträge", len(vacations))
     
     st.divider()
     
-    # Typ-zu-Farbe Mapping
-    TYPE_COLORS = {
-        "Schulferien": "#FF6B6B",
-        "Urlaub": "#4ECDC4",
-        "Feiertag": "#45B7D1",
-        "Brückentag": "#FFA07A",
-        "Homeoffice": "#98D8C8"
-    }
-    
-    TYPE_ICONS = {
-        "Schulferien": "🎒",
-        "Urlaub": "✈️",
-        "Feiertag": "🎉",
-        "Brückentag": "🌉",
-        "Homeoffice": "💻"
-    }
+    # Typ-Farben einmal als CSS-Klassen senden, die Karten referenzieren nur noch die Klasse
+    st.markdown(VACATION_TYPE_CSS, unsafe_allow_html=True)
     
     # Timeline-Ansicht
-    if vacations:
+    if vacations or all_persons:
         st.title("🗓️ Ferienzeiten Übersicht")
         
-        # Filtere Vacations
-        filtered_vacations = [
-            v for v in vacations
-            if (not filter_person or v['person'] in filter_person)
-            and (not filter_type or v['type'] in filter_type)
-        ]
-        
-        if filtered_vacations:
-            # Gruppiere nach Monat
-            months = {}
-            for vacation in filtered_vacations:
-                start = datetime.strptime(vacation['start_date'], '%Y-%m-%d')
-                month_key = start.strftime('%B %Y')
-                if month_key not in months:
-                    months[month_key] = []
-                months[month_key].append(vacation)
+        if vacations:
+            # Gruppiere nach Monat (Datumswerte werden dabei einmal pro Eintrag geparst)
+            # Die Abfrage liefert nach start_date sortiert, daher sind auch die Monatslisten bereits sortiert
+            months = defaultdict(list)
+            for vacation in vacations:
+                start = datetime.fromisoformat(vacation['start_date'])
+                end = datetime.fromisoformat(vacation['end_date'])
+                months[start.strftime('%B %Y')].append((vacation, start, end))
             
-            # Zeige nach Monaten gruppiert
+            # Zeige nach Monaten gruppiert: Überschrift + alle Karten eines Monats in einem st.markdown
             for month, month_vacations in months.items():
-                st.markdown(f"""
-                <div style="background: linear-gradient(145deg, rgba(102, 126, 234, 0.12), rgba(118, 75, 162, 0.12));
-                            backdrop-filter: blur(20px);
-                            padding: 16px 24px;
-                            border-radius: 18px;
-                            margin-bottom: 20px;
-                            box-shadow: 0 8px 24px rgba(102, 126, 234, 0.15),
-                                        inset 0 1px 0 rgba(255, 255, 255, 0.8);
-                            border-left: 5px solid #667eea;">
-                    <h3 style="margin: 0; color: #667eea; font-weight: 800; font-size: 1.3em;">
-                        📆 {month}
-                    </h3>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                for vacation in sorted(month_vacations, key=lambda x: x['start_date']):
-                    col1, col2 = st.columns([6, 1])
+                cards_html = [VACATION_MONTH_TEMPLATE.format(month=month), '<div class="fd-vac-grid">']
+                for vacation, start, end in month_vacations:
+                    # Berechne Dauer
+                    duration = (end - start).days + 1
+                    
+                    icon = TYPE_ICONS.get(vacation['type'], '📅')
                     
-                    with col1:
-                        # Berechne Dauer
-                        start = datetime.strptime(vacation['start_date'], '%Y-%m-%d')
-                        end = datetime.strptime(vacation['end_date'], '%Y-%m-%d')
-                        duration = (end - start).days + 1
-                        
-                        color = TYPE_COLORS.get(vacation['type'], '#667eea')
-                        icon = TYPE_ICONS.get(vacation['type'], '📅')
-                        
-                        notes_html = f'''
-                        <div style="background: rgba(248, 250, 252, 0.8);
-                                    padding: 14px 18px;
-                                    border-radius: 12px;
-                                    margin-top: 16px;
-                                    border-left: 3px solid {color};
-                                    color: #4a5568;
-                                    line-height: 1.7;
-                                    font-size: 0.95em;">
-                            💬 {vacation.get('notes', '')}
-                        </div>
-                        ''' if vacation.get('notes') else ''
-                        
-                        # Premium Vacation Card (HTML-Komponente)
-                        st.components.v1.html(f"""
-                        <!DOCTYPE html>
-                        <html>
-                        <head>
-                            <meta charset="UTF-8">
-                            <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap" rel="stylesheet">
-                            <style>
-                            * {{
-                                font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-                                margin: 0;
-                                padding: 0;
-                                box-sizing: border-box;
-                            }}
-                            body {{
-                                background: transparent;
-                                padding: 10px;
-                            }}
-                            .vacation-card {{
-                                background: linear-gradient(145deg, rgba(255, 255, 255, 0.98), rgba(248, 250, 252, 0.98));
-                                backdrop-filter: blur(20px);
-                                border-radius: 22px;
-                                padding: 24px;
-                                box-shadow: 0 12px 40px rgba(102, 126, 234, 0.12),
-                                            inset 0 1px 0 rgba(255, 255, 255, 0.8);
-                                border-left: 6px solid {color};
-                                border: 1.5px solid rgba(102, 126, 234, 0.15);
-                                transition: all 0.4s ease;
-                                position: relative;
-                                overflow: hidden;
-                            }}
-                            .vacation-card:hover {{
-                                transform: translateY(-5px);
-                                box-shadow: 0 20px 60px rgba(102, 126, 234, 0.2);
-                            }}
-                            .glossy-overlay {{
-                                position: absolute;
-                                top: 0;
-                                left: 0;
-                                right: 0;
-                                height: 50%;
-                                background: linear-gradient(180deg, rgba(255,255,255,0.4), transparent);
-                                pointer-events: none;
-                            }}
-                            </style>
-                        </head>
-                        <body>
-                            <div class="vacation-card">
-                                <div class="glossy-overlay"></div>
-                                
-                                <div style="display: flex; align-items: center; justify-content: space-between; margin-bottom: 16px;">
-                                    <div style="display: flex; align-items: center; gap: 14px;">
-                                        <div style="background: linear-gradient(145deg, {color}85, {color}60);
-                                                     width: 60px; height: 60px;
-                                                     border-radius: 16px;
-                                                     display: flex; align-items: center; justify-content: center;
-                                                     font-size: 2em;
-                                                     box-shadow: 0 8px 24px {color}40, inset 0 2px 4px rgba(255,255,255,0.3);">
-                                            {icon}
-                                        </div>
-                                        <div>
-                                            <div style="background: linear-gradient(145deg, {color}65, {color}40);
-                                                         padding: 8px 18px;
-                                                         border-radius: 12px;
-                                                         display: inline-block;
-                                                         color: white;
-                                                         font-weight: 700;
-                                                         font-size: 0.9em;
-                                                         box-shadow: 0 4px 16px {color}30;
-                                                         margin-bottom: 6px;">
-                                                {vacation['type']}
-                                            </div>
-                                            <div style="color: #888; font-size: 0.85em; font-weight: 600;">
-                                                ⏱️ {duration} Tag{"e" if duration != 1 else ""}
-                                            </div>
-                                        </div>
-                                    </div>
-                                </div>
-                                
-                                <h3 style="margin: 16px 0 14px 0; 
-                                           font-size: 1.5em; 
-                                           font-weight: 800;
-                                           background: linear-gradient(135deg, {color}, {color}DD);
-                                           -webkit-background-clip: text;
-                                           -webkit-text-fill-color: transparent;
-                                           line-height: 1.3;">
-                                    {vacation['title']}
-                                </h3>
-                                
-                                <div style="background: linear-gradient(145deg, rgba(102, 126, 234, 0.12), rgba(118, 75, 162, 0.08));
-                                             padding: 14px 20px;
-                                             border-radius: 14px;
-                                             margin: 16px 0;
-                                             box-shadow: 0 4px 12px rgba(102, 126, 234, 0.08);
-                                             display: flex;
-                                             align-items: center;
-                                             gap: 12px;
-                                             flex-wrap: wrap;">
-                                    <div style="font-weight: 700; color: #667eea; font-size: 1.1em;">
-                                        📅 {start.strftime('%d.%m.%Y')}
-                                    </div>
-                                    <div style="color: #999; font-weight: 600;">→</div>
-                                    <div style="font-weight: 700; color: #764ba2; font-size: 1.1em;">
-                                        📅 {end.strftime('%d.%m.%Y')}
-                                    </div>
-                                </div>
-                                
-                                <div style="display: flex; gap: 10px; margin: 16px 0;">
-                                    <span style="background: linear-gradient(145deg, rgba(102, 126, 234, 0.18), rgba(102, 126, 234, 0.12));
-                                                 padding: 10px 18px;
-                                                 border-radius: 12px;
-                                                 font-size: 0.95em;
-                                                 font-weight: 700;
-                                                 color: #667eea;
-                                                 box-shadow: 0 2px 8px rgba(102, 126, 234, 0.15);">
-                                        👤 {vacation.get('person', 'N/A')}
-                                    </span>
-                                </div>
-                                
-                                {notes_html}
-                            </div>
-                        </body>
-                        </html>
-                        """, height=350)
-                        # **HINWEIS:** Der ursprüngliche redundante st.markdown Block wurde hier entfernt.
+                    notes_html = VACATION_NOTES_TEMPLATE.format(
+                        notes=_html_text(vacation['notes'])
+                    ) if vacation.get('notes') else ''
                     
-                    with col2:
-                        # Leerraum für Ausrichtung
-                        st.markdown("<br><br>", unsafe_allow_html=True) 
-                        if st.button("🗑️", key=f"del_vac_{vacation['id']}", use_container_width=True, type="secondary"):
-                            try:
-                                # Annahme: 'supabase' ist definiert
-                                supabase.table('vacations').delete().eq('id', vacation['id']).execute()
-                                st.success("✅ Gelöscht!")
-                                st.rerun()
-                            except NameError:
-                                st.error("❌ Fehler: Supabase-Client nicht definiert.")
-                            except Exception as e:
-                                st.error(f"❌ Fehler beim Löschen: {str(e)}")
+                    cards_html.append(VACATION_CARD_TEMPLATE.format(
+                        icon=icon,
+                        type=_html_text(vacation['type']),
+                        duration=duration,
+                        plural="e" if duration != 1 else "",
+                        title=_html_text(vacation['title']),
+                        start=start.strftime('%d.%m.%Y'),
+                        end=end.strftime('%d.%m.%Y'),
+                        person=_html_text(vacation.get('person'), 'N/A'),
+                        notes_html=notes_html
+                    ))
+                cards_html.append('</div>')
+                st.markdown("".join(cards_html), unsafe_allow_html=True)
+            
+            # Löschen: ausgewählte Einträge mit einem einzigen DELETE entfernen
+            with st.expander("🗑️ Ferienzeiten löschen"):
+                labels = {
+                    v['id']: f"{v['title']} ({v.get('person') or 'N/A'}, {v['start_date']})"
+                    for v in vacations
+                }
+                delete_ids = st.multiselect("Einträge", list(labels), format_func=labels.get, key="vac_delete_sel")
+                if st.button("🗑️ Löschen", key="vac_delete", type="secondary", disabled=not delete_ids):
+                    try:
+                        supabase.table('vacations').delete().in_('id', delete_ids).execute()
+                        _invalidate('vacations')
+                        st.success("✅ Gelöscht!")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"❌ Fehler beim Löschen: {str(e)}")
         else:
             st.markdown("""
             <div style="text-align: center; padding: 80px 20px;
@@ -744,113 +1336,13 @@ def vacation_planning():
                 </div>
                 """, unsafe_allow_html=True)
 
-import streamlit as st
-from datetime import datetime, timedelta
-
 # Hinweis: Die globalen Variablen 'supabase' und 'COLORS' werden hier vorausgesetzt.
 
 def weekly_schedule():
     st.title("📆 Wochenplan")
     
     # --- 1. GLOBALE CSS-KORREKTUR ---
-    st.markdown("""
-    <style>
-        /* CSS-Stile für die optische Gestaltung (Glossy-Look, Box-Schatten, Hintergrund-Fixes) */
-        .stApp {
-            background-color: transparent !important;
-        }
-
-        /* HARD FIX: Verstecke alle unsichtbaren Streamlit-Blöcke (verhindert helle Boxen) */
-        div[data-testid^="stHorizontalBlock"],
-        div[data-testid^="stVerticalBlock"],
-        div[data-testid="stBlock"] {
-            background-color: transparent !important;
-            box-shadow: none !important;
-            border: none !important;
-            padding: 0 !important;
-            margin: 0 !important;
-        }
-        
-        div[data-testid^="stVerticalBlock"] > div:empty,
-        div[data-testid^="stHorizontalBlock"] > div:empty,
-        div[data-testid="stBlock"] > div:empty {
-            background-color: transparent !important;
-            box-shadow: none !important;
-            border: none !important;
-        }
-
-        /* KORREKTUR: st.divider() Linien */
-        .stDivider {
-            background: transparent !important;
-            box-shadow: none !important;
-            border: none !important;
-            padding: 0 !important;
-            margin: 20px 0 !important;
-        }
-        .stDivider > div {
-            border-top: 2px solid rgba(255, 255, 255, 0.15) !important;
-            height: 0 !important;
-        }
-        
-        /* Gezielte Glossy-Anpassung der sichtbaren Streamlit-Widgets */
-        .stExpander, 
-        .stMultiSelect, 
-        .stSelectbox, 
-        .stTextInput, 
-        .stTextArea, 
-        .stDateInput, 
-        .stTimeInput,
-        div[data-testid="stForm"],
-        div[data-testid="stHorizontalBlock"] > div:nth-child(2)
-        {
-            background: rgba(255, 255, 255, 0.08) !important;
-            backdrop-filter: blur(15px) saturate(180%);
-            -webkit-backdrop-filter: blur(15px) saturate(180%);
-            border-radius: 18px !important;
-            border: 1px solid rgba(255, 255, 255, 0.2) !important;
-            box-shadow: 0 4px 20px rgba(0, 0, 0, 0.2), inset 0 1px 0 rgba(255, 255, 255, 0.3);
-            padding: 15px;
-            color: #f3f4f6;
-        }
-        
-        .create-card {
-            background: linear-gradient(135deg, rgba(102, 126, 234, 0.15), rgba(118, 75, 162, 0.15)) !important;
-            border: 2px solid rgba(102, 126, 234, 0.4) !important;
-            border-radius: 28px !important;
-            box-shadow: 0 15px 45px rgba(102, 126, 234, 0.3), inset 0 2px 0 rgba(255, 255, 255, 0.4);
-            padding: 0; 
-        }
-        .create-card .stExpander {
-             box-shadow: none !important;
-             border: none !important;
-        }
-
-        .delete-button-box {
-            background: rgba(255, 59, 48, 0.15) !important;
-            backdrop-filter: blur(10px);
-            border: 2px solid rgba(255, 59, 48, 0.3) !important;
-            border-radius: 16px !important;
-            padding: 8px !important;
-            box-shadow: 0 8px 24px rgba(255, 59, 48, 0.25), inset 0 1px 0 rgba(255, 255, 255, 0.2);
-            transition: all 0.3s ease;
-        }
-        .delete-button-box:hover {
-            background: rgba(255, 59, 48, 0.25) !important;
-            border-color: rgba(255, 59, 48, 0.5) !important;
-            box-shadow: 0 12px 32px rgba(255, 59, 48, 0.4);
-            transform: translateY(-2px);
-        }
-        
-    </style>
-    """, unsafe_allow_html=True)
-
-    
-    # Session State initialisieren
-    if 'family_id' not in st.session_state:
-        st.session_state.family_id = 1 
-    if 'week_offset' not in st.session_state:
-        st.session_state.week_offset = 0
-
+    st.markdown(WEEKLY_CSS, unsafe_allow_html=True)
     
     if not st.session_state.get('family_id'):
         st.warning("⚠️ Sie sind keiner Familie zugeordnet.")
@@ -862,7 +1354,7 @@ def weekly_schedule():
         col1, col2 = st.columns(2)
         with col1:
             event_title = st.text_input("📝 Titel", key="event_title")
-            person = st.text_input("👤 Person", key="event_person")
+            person = st.text_input("👤 Person", key="event_person", value=st.session_state.display_name or '')
             # Sicherstellen, dass COLORS existiert
             category_options = list(COLORS.keys()) if 'COLORS' in globals() else ["Kategorie 1", "Kategorie 2"]
             event_category = st.selectbox("🏷️ Kategorie", category_options, key="event_cat")
@@ -880,15 +1372,16 @@ def weekly_schedule():
                         "title": event_title,
                         "person": person,
                         "category": event_category,
-                        "event_date": str(event_date),
-                        "start_time": str(start_time),
-                        "end_time": str(end_time),
+                        "event_date": event_date.isoformat(),
+                        "start_time": start_time.isoformat(),
+                        "end_time": end_time.isoformat(),
                         "description": description,
                         "family_id": st.session_state.family_id
                     }
                     response = globals()['supabase'].table('schedule_events').insert(event_data).execute()
                     
                     if hasattr(response, 'data') and response.data:
+                        _invalidate('schedule_events')
                         st.success("✅ Termin erfolgreich erstellt!")
                         st.rerun()
                     else:
@@ -902,142 +1395,51 @@ def weekly_schedule():
     
     st.divider()
     
-    # --- 3. DATEN LADEN & DATUMSFILTER (Supabase Select Aktiviert) ---
-    today = datetime.now().date()
-        
-    week_offset = st.session_state.get('week_offset', 0)
-    
-    # Ermitteln des Start- und Enddatums der Woche (Montag bis Sonntag)
-    week_start = today - timedelta(days=today.weekday()) + timedelta(weeks=week_offset)
-    week_end = week_start + timedelta(days=6)
-    
-    events = []
-    
-    try:
-        if 'supabase' not in globals():
-            st.error("❌ Kritischer Fehler: Supabase-Client ('supabase') ist nicht global verfügbar.")
-            events = [] 
-            
-        else:
-            # SUPABASE QUERY AKTIVIERT: Nur Events für die aktuelle 7-Tage-Periode
-            response = globals()['supabase'].table('schedule_events')\
-                .select('*')\
-                .eq('family_id', st.session_state.family_id)\
-                .gte('event_date', str(week_start))\
-                .lte('event_date', str(week_end))\
-                .order('event_date')\
-                .order('start_time')\
-                .execute()
-            
-            # Daten aus der Response extrahieren
-            events = response.data if hasattr(response, 'data') and response.data else [] 
-            
-    except Exception as e:
-        st.error(f"❌ Fehler beim Laden der Termine: {str(e)}. (Prüfen Sie Tabellennamen und RLS in Supabase)")
-        events = []
+    _week_view()
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def _build_calendar_html(visible_events, week_start, today):
+    """Baut das Kalender-HTML der Woche; unveränderte Woche und Filter liefern den gecachten String."""
+    week_days = [week_start + timedelta(days=i) for i in range(7)]
+    day_keys = [str(day) for day in week_days]
     
-    # --- 4. WOCHENNAVIGATION ---
-    col1, col2, col3 = st.columns([1, 3, 1])
-    with col1:
-        if st.button("◀ Zurück", use_container_width=True, key="prev_week"):
-            st.session_state.week_offset -= 1
-            st.rerun()
-    with col2:
-        st.markdown(f"""
-        <div style="text-align: center; padding: 16px; 
-                      background: linear-gradient(135deg, #1f2937 0%, #0f172a 100%); 
-                      border-radius: 18px; color: #9ca3af; font-weight: 700; font-size: 1.1em;
-                      box-shadow: 0 10px 40px rgba(0, 0, 0, 0.5), inset 0 2px 0 rgba(255, 255, 255, 0.1);
-                      border: 2px solid rgba(255, 255, 255, 0.1);">
-              📅 <span style="color: white;">{week_start.strftime('%d.%m.%Y')} - {week_end.strftime('%d.%m.%Y')}</span>
-        </div>
-        """, unsafe_allow_html=True)
-    with col3:
-        if st.button("Weiter ▶", use_container_width=True, key="next_week"):
-            st.session_state.week_offset += 1
-            st.rerun()
+    # Einmalig nach (Tag, Startstunde) gruppieren
+    events_by_slot = defaultdict(list)
+    for e in visible_events:
+        events_by_slot[(e['event_date'], e['hour'])].append(e)
     
-    if st.session_state.get('week_offset', 0) != 0:
-        if st.button("🎯 **Zurück zu heute**", use_container_width=True, key="today_btn", type="secondary"):
-            st.session_state.week_offset = 0
-            st.rerun()
-    
-    # Filter
-    all_persons = list(set([e.get('person', '') for e in events if e.get('person')]))
-    if all_persons:
-        filter_person = st.multiselect("👥 **Nach Person filtern**", all_persons, default=all_persons, key="schedule_filter")
-    else:
-        filter_person = []
-    
-    st.divider()
-    
-    # --- 5. KALENDER GRID HTML & Anzeige ---
-    time_slots = [f"{h:02d}:00" for h in range(6, 23)]
-    days_of_week = ["Montag", "Dienstag", "Mittwoch", "Donnerstag", "Freitag", "Samstag", "Sonntag"]
-    days_short = ["Mo", "Di", "Mi", "Do", "Fr", "Sa", "So"]
-    
-    calendar_html = '<div class="calendar-grid">'
+    parts = ['<div class="calendar-grid">', CALENDAR_TIME_HEADER]
     
     # Header
-    calendar_html += '<div class="calendar-header time-header">⏰<br><span style="font-size: 0.8em;">Zeit</span></div>'
-    for i, (day_name, day_short) in enumerate(zip(days_of_week, days_short)):
-        day = week_start + timedelta(days=i)
+    for day, day_short in zip(week_days, WEEKDAYS_SHORT):
         is_today_class = "today-header" if day == today else ""
         today_marker = "🔥 " if day == today else ""
-        calendar_html += f'''
+        parts.append(f'''
         <div class="calendar-header {is_today_class}">
             {today_marker}<strong>{day_short}</strong><br>
             <span style="font-size: 0.85em; opacity: 0.95;">{day.strftime("%d.%m")}</span>
         </div>
-        '''
+        ''')
     
     # Zellen-Inhalt
-    for time_slot in time_slots:
-        calendar_html += f'<div class="time-label">{time_slot}</div>'
+    for hour, time_label in TIME_SLOTS:
+        parts.append(time_label)
         
-        for i in range(7):
-            day = week_start + timedelta(days=i)
-            day_str = str(day)
+        for day, day_key in zip(week_days, day_keys):
             is_today_class = "today" if day == today else ""
+            day_events = events_by_slot.get((day_key, hour), ())
             
-            # Events filtern (nach Tag, Person und Startstunde)
-            day_events = [
-                e for e in events 
-                if e.get('event_date') == day_str
-                and (not filter_person or e.get('person') in filter_person)
-                # Filter auf die Stunden-Spalte (erste 2 Zeichen der Zeit)
-                and e.get('start_time', '')[:5].split(':')[0] == time_slot[:2] 
-            ]
-            
-            cell_content = ""
-            for event in day_events:
-                color = COLORS.get(event.get('category'), '#CCCCCC') if 'COLORS' in globals() else '#CCCCCC'
-                event_id = event.get('id', 'temp_id')
-                desc_safe = event.get('description', '').replace('"', '&quot;').replace("'", '&#39;')
-                
-                cell_content += f'''
-                <div class="event-block" 
-                      style="background: linear-gradient(145deg, {color}30, {color}15); 
-                            border-left: 5px solid {color};
-                            box-shadow: 0 8px 24px {color}30, inset 0 1px 0 rgba(255,255,255,0.2);" 
-                      onclick="deleteEvent('{event_id}')"
-                      title="🗑️ Klicken zum Löschen: {desc_safe}">
-                    <div class="event-time">{event.get('start_time', '')[:5]}-{event.get('end_time', '')[:5]}</div>
-                    <div class="event-title">{event.get('title', 'N/A')}</div>
-                    <div class="event-person">👤 {event.get('person', 'N/A')}</div>
-                    <div class="delete-hint">
-                        <div style="background: rgba(255, 255, 255, 0.15); padding: 5px 10px; border-radius: 8px; margin-top: 5px; font-weight: 600;">🗑️ Löschen</div>
-                    </div>
-                </div>
-                '''
-            
-            calendar_html += f'<div class="calendar-cell {is_today_class}">{cell_content}</div>'
+            cell_content = ''.join(
+                EVENT_BLOCK_TEMPLATE.format_map(event)
+                for event in sorted(day_events, key=_start_time_key)
+            )
+            parts.append(f'<div class="calendar-cell {is_today_class}">{cell_content}</div>')
     
-    calendar_html += '</div>'
+    parts.append('</div>')
+    calendar_html = ''.join(parts)
     
     # Komponenten HTML für Grid
-    st.components.v1.html(f"""
+    return f"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -1101,7 +1503,6 @@ def weekly_schedule():
             padding: 5px 8px;
             border-radius: 8px;
             font-size: 0.85em;
-            cursor: pointer;
             transition: transform 0.2s, box-shadow 0.2s;
             position: relative;
             overflow: hidden;
@@ -1122,92 +1523,123 @@ def weekly_schedule():
             opacity: 0.8;
             font-weight: 500;
         }}
-        .delete-hint {{
-            position: absolute;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background: rgba(255, 0, 0, 0.9);
-            color: white;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            font-weight: bold;
-            opacity: 0;
-            transition: opacity 0.2s;
-            z-index: 10;
-        }}
-        .event-block:hover .delete-hint {{
-            opacity: 1;
-        }}
         </style>
     </head>
     <body>
         {calendar_html}
-        
-        <input type="hidden" id="delete_event_id_input" onchange="window.parent.document.dispatchEvent(new CustomEvent('streamlit:setComponentValue', {{ detail: {{ key: 'delete_event_id', value: this.value }} }}))">
-        
-        <script>
-        function deleteEvent(id) {{
-            // Setzt die ID in das versteckte Feld, was das onchange-Event auslöst und Streamlit benachrichtigt
-            let input = document.getElementById('delete_event_id_input');
-            input.value = id;
-            
-            // Dies ist ein Workaround, um Streamlit das Update zu signalisieren
-            if (window.parent.document.querySelector('[data-testid="stInputContainer"]')) {{
-                 // Moderne Streamlit-Versionen nutzen CustomEvent/setComponentValue (wie im input-Tag)
-                 console.log('Event Löschen für ID:', id);
-            }} else {{
-                // Fallback (selten notwendig, da der Input-Hook im HTML ist)
-                alert('Termin mit ID ' + id + ' wird zur Löschung markiert.');
-            }}
-        }}
-        </script>
     </body>
     </html>
-    """, height=2000, scrolling=True)
-    
-    # --- 6. EVENT-LÖSCHUNG VERARBEITEN (Supabase Delete Aktiviert) ---
-    if 'delete_event_id' in st.session_state and st.session_state.delete_event_id:
-        event_id = st.session_state.delete_event_id
-        
-        # Um doppeltes Ausführen zu verhindern
-        st.session_state.delete_event_id = None 
+    """
+
+def _shift_week(delta):
+    """Callback der Wochennavigation (None = zurück zur aktuellen Woche)."""
+    st.session_state.week_offset = 0 if delta is None else st.session_state.week_offset + delta
+
+@st.fragment
+def _week_view():
+    """Navigation, Filter, Kalender und Löschen der Woche; Klicks rerunnen nur dieses Fragment."""
+    _report_write_errors()  # Fragment-Reruns laufen nicht durch main()
+    # --- 3. DATEN LADEN & DATUMSFILTER (Supabase Select Aktiviert) ---
+    today = datetime.now().date()
         
-        try:
-            if 'supabase' in globals():
-                # SUPABASE DELETE LOGIK
-                response = globals()['supabase'].table('schedule_events').delete().eq('id', event_id).execute()
-                
-                # Check, ob der DELETE erfolgreich war (kann je nach RLS 0 oder mehr Zeilen zurückgeben)
-                # Wir gehen davon aus, dass, wenn keine Exception geworfen wird, es funktioniert hat
-                st.success(f"✅ Termin (ID: {event_id}) erfolgreich gelöscht!")
-                st.rerun() 
-            else:
-                 st.error("❌ Supabase-Client nicht verfügbar. Löschvorgang nicht ausgeführt.")
-        except Exception as e:
-            st.error(f"❌ Fehler beim Löschen: {str(e)}")
+    week_offset = st.session_state.get('week_offset', 0)
+    
+    # Ermitteln des Start- und Enddatums der Woche (Montag bis Sonntag)
+    week_start = today - timedelta(days=today.weekday()) + timedelta(weeks=week_offset)
+    week_end = week_start + timedelta(days=6)
+    
+    events = []
+    
+    try:
+        if 'supabase' not in globals():
+            st.error("❌ Kritischer Fehler: Supabase-Client ('supabase') ist nicht global verfügbar.")
+            events = [] 
+            
+        else:
+            # Nur Events für die aktuelle 7-Tage-Periode (gecacht pro Woche)
+            events = _session_cached('schedule_events', _load_schedule_events, st.session_state.family_id, week_start, week_end)
             
-        # Clear the flag (important for not looping on the next run)
-        if 'delete_event_id' in st.session_state:
-             del st.session_state.delete_event_id # Final aufräumen
+    except Exception as e:
+        st.error(f"❌ Fehler beim Laden der Termine: {str(e)}. (Prüfen Sie Tabellennamen und RLS in Supabase)")
+        events = []
+
+    
+    # --- 4. WOCHENNAVIGATION ---
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        st.button("◀ Zurück", use_container_width=True, key="prev_week", on_click=_shift_week, args=(-1,))
+    with col2:
+        st.markdown(f"""
+        <div style="text-align: center; padding: 16px; 
+                      background: linear-gradient(135deg, #1f2937 0%, #0f172a 100%); 
+                      border-radius: 18px; color: #9ca3af; font-weight: 700; font-size: 1.1em;
+                      box-shadow: 0 10px 40px rgba(0, 0, 0, 0.5), inset 0 2px 0 rgba(255, 255, 255, 0.1);
+                      border: 2px solid rgba(255, 255, 255, 0.1);">
+              📅 <span style="color: white;">{week_start.strftime('%d.%m.%Y')} - {week_end.strftime('%d.%m.%Y')}</span>
+        </div>
+        """, unsafe_allow_html=True)
+    with col3:
+        st.button("Weiter ▶", use_container_width=True, key="next_week", on_click=_shift_week, args=(1,))
+    
+    if st.session_state.get('week_offset', 0) != 0:
+        st.button("🎯 **Zurück zu heute**", use_container_width=True, key="today_btn", type="secondary", on_click=_shift_week, args=(None,))
+    
+    # Filter
+    all_persons = sorted({e['person'] for e in events if e.get('person')})
+    if all_persons:
+        filter_person = st.multiselect("👥 **Nach Person filtern**", all_persons, default=all_persons, key="schedule_filter")
+    else:
+        filter_person = []
+    
+    st.divider()
+    
+    # --- 5. KALENDER GRID HTML & Anzeige ---
+    # Personenfilter einmal anwenden; das HTML wird pro (Events, Woche, heute) gecacht
+    visible_events = [e for e in events if not filter_person or e.get('person') in filter_person]
+    st.components.v1.html(_build_calendar_html(visible_events, week_start, today), height=2000, scrolling=True)
+    
+    # --- 6. EVENT-LÖSCHUNG: alle ausgewählten Termine in einem Formular, ein einziger DELETE ---
+    if visible_events:
+        with st.form("delete_events", clear_on_submit=True):
+            labels = {
+                e['id']: f"{e['event_date']} {e['start']} – {e.get('title', 'N/A')} ({e.get('person') or 'N/A'})"
+                for e in visible_events
+            }
+            delete_ids = st.multiselect("🗑️ Termine dieser Woche löschen", list(labels), format_func=labels.get, key="delete_event_ids")
+            if st.form_submit_button("🗑️ Löschen", use_container_width=True) and delete_ids:
+                # Optimistisch: sofort aus der Ansicht entfernen, DELETE läuft im Hintergrund
+                rollback = _drop_cached_rows('schedule_events', delete_ids)
+                _write_in_background('schedule_events', supabase.table('schedule_events').delete().in_('id', delete_ids), rollback)
+                st.rerun(scope="fragment")
+
+# Navigation: Seitentitel -> Render-Funktion
+PAGES = {
+    "📋 Kanban": kanban_board,
+    "🛒 Einkaufsliste": shopping_list,
+    "🏖️ Ferienplanung": vacation_planning,
+    "📆 Wochenplan": weekly_schedule
+}
 
 # Hauptanwendung
 def main():
+    _prune_session_cache()
+    restore_session()
+    write_cookie()
+    _report_write_errors()
+    
     if not st.session_state.authenticated:
         login_page()
     else:
         # Sidebar
         with st.sidebar:
-            st.title(f"👋 {st.session_state.get('display_name', 'Benutzer')}")
-            st.caption(f"Rolle: {st.session_state.get('user_role', 'Member')}")
+            st.title(f"👋 {st.session_state.display_name or 'Benutzer'}")
+            st.caption(f"Rolle: {st.session_state.user_role}")
             
             st.divider()
             
             page = st.radio(
                 "Navigation",
-                ["📋 Kanban", "🛒 Einkaufsliste", "🏖️ Ferienplanung", "📆 Wochenplan"],
+                list(PAGES),
                 label_visibility="collapsed"
             )
             
@@ -1218,14 +1650,7 @@ def main():
                 st.rerun()
         
         # Hauptbereich
-        if "Kanban" in page:
-            kanban_board()
-        elif "Einkaufsliste" in page:
-            shopping_list()
-        elif "Ferienplanung" in page:
-            vacation_planning()
-        elif "Wochenplan" in page:
-            weekly_schedule()
+        PAGES[page]()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,20 @@
+-- Indizes für die Lesezugriffe von app.py (Filter auf family_id, Sortierung wie in den Loadern).
+-- Ohne CONCURRENTLY: die Supabase CLI führt jede Migration in einer Transaktion aus.
+
+-- _load_schedule_events: family_id = ?, event_date zwischen Wochenstart und -ende, order by event_date, start_time
+create index if not exists idx_schedule_events_family_date_start
+    on public.schedule_events (family_id, event_date, start_time);
+
+-- _load_vacations: family_id = ?, start_date <= Fensterende, order by start_date
+create index if not exists idx_vacations_family_start
+    on public.vacations (family_id, start_date);
+
+-- _query_task_page: family_id = ?, status = ?, (created_at, id) < Cursor, order by created_at desc, id desc, limit
+create index if not exists idx_tasks_family_status_created
+    on public.tasks (family_id, status, created_at desc, id desc);
+
+-- _load_shopping_lists: family_id = ?, eingebettete Artikel über shopping_items.list_id
+create index if not exists idx_shopping_lists_family
+    on public.shopping_lists (family_id);
+create index if not exists idx_shopping_items_list
+    on public.shopping_items (list_id);